@@ -1,7 +1,21 @@
 import discord
 from discord.ext import commands
+import asyncio
+import heapq
+import logging
 import re
 import random
+import sys
+import threading
+import time
+import traceback
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from array import array
 from typing import List, Dict, Optional
 
 # Bot configuration
@@ -13,38 +27,352 @@ intents.guild_messages = True
 
 bot = commands.Bot(command_prefix='!', intents=intents)
 
+# Playlists with at least this many entries are arranged in a worker process
+PLAYLIST_OFFLOAD_THRESHOLD = 500
+# Maximum time (seconds) a playlist arrangement may take before the command gives up
+PLAYLIST_TIMEOUT = 30
+# Minimum number of other movies between two plays of the same movie (1 = no consecutive duplicates)
+DEFAULT_MIN_GAP = 1
+
+_playlist_executor = None
+
+def get_playlist_executor() -> ProcessPoolExecutor:
+    """Lazily create the process pool used for heavy playlist work"""
+    global _playlist_executor
+    if _playlist_executor is None:
+        _playlist_executor = ProcessPoolExecutor(max_workers=2)
+    return _playlist_executor
+
+def shutdown_playlist_executor(executor: Optional[ProcessPoolExecutor] = None, wait: bool = True):
+    """Shut the process pool down; the next offload creates a fresh one
+
+    If `executor` is given, the pool is only shut down while it is still the current one,
+    so a pool another command already replaced is left alone.
+    """
+    global _playlist_executor
+    if _playlist_executor is not None and executor in (None, _playlist_executor):
+        _playlist_executor.shutdown(wait=wait, cancel_futures=True)
+        _playlist_executor = None
+
+# Event-loop watchdog: heartbeat interval, stall threshold (seconds) and log file
+WATCHDOG_INTERVAL = 0.25
+WATCHDOG_THRESHOLD = 1.0
+WATCHDOG_LOG_FILE = 'watchdog.log'
+# Most stalls !loop_stats shows at once, keeping the embed under Discord's 6000 character limit
+LOOP_STATS_MAX_STALLS = 5
+
+watchdog_logger = logging.getLogger('movie_rating_bot.watchdog')
+
+class LoopWatchdog:
+    """Measure event-loop lag and capture the stack of callbacks that block the loop"""
+    
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, threshold: float = WATCHDOG_THRESHOLD,
+                 log_file: Optional[str] = WATCHDOG_LOG_FILE, max_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.log_file = log_file
+        self.loop = None
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.current_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = deque(maxlen=max_stalls)
+        self.active_commands = {}  # {asyncio.Task: (command_name, guild_name, channel_name)}
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._reported_beat = None
+        self._open_stall = None  # Stall still in progress, finished by the next heartbeat
+        self._lock = threading.Lock()
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start the heartbeat task and the monitor thread (no-op if already running)"""
+        if self._task is not None:
+            return
+        
+        if self.log_file and not watchdog_logger.handlers:
+            handler = logging.FileHandler(self.log_file, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+            watchdog_logger.addHandler(handler)
+            watchdog_logger.setLevel(logging.INFO)
+        
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._monitor, name='loop-watchdog', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the heartbeat task and the monitor thread"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def track_command(self, ctx):
+        """Remember which command, guild and channel the current task is running"""
+        task = asyncio.current_task()
+        if task is not None:
+            guild = f"{ctx.guild.name} ({ctx.guild.id})" if ctx.guild else 'DM'
+            channel = getattr(ctx.channel, 'name', None) or str(ctx.channel)
+            self.active_commands[task] = (ctx.command.qualified_name if ctx.command else None, guild, channel)
+    
+    def untrack_command(self):
+        """Forget the command running in the current task"""
+        self.active_commands.pop(asyncio.current_task(), None)
+    
+    async def _heartbeat(self):
+        """Sleep for a fixed interval and measure how late the loop wakes us up"""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.current_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            with self._lock:
+                self.last_beat = now
+                stall, self._open_stall = self._open_stall, None
+            if stall is not None:
+                # The monitor only saw the stall start; record how long it really lasted
+                stall['blocked'] = lag
+                stall['ongoing'] = False
+                watchdog_logger.warning("Event loop lag of %.2fs in command %s (guild %s, channel %s)",
+                                        lag, stall['command'] or 'unknown', stall['guild'] or 'unknown',
+                                        stall['channel'] or 'unknown')
+            elif lag >= self.threshold:
+                watchdog_logger.warning("Event loop lag of %.2fs", lag)
+    
+    def _monitor(self):
+        """Runs in a separate thread: detect a stalled heartbeat while the loop is still blocked"""
+        while not self._stop.wait(self.interval):
+            beat = self.last_beat
+            # Lag so far: how far past its sleep interval the heartbeat is
+            blocked = time.monotonic() - beat - self.interval
+            # Report each stall once, while the blocking callback is still on the stack
+            if blocked >= self.threshold and beat != self._reported_beat:
+                self._reported_beat = beat
+                self._record_stall(beat, blocked)
+    
+    def _record_stall(self, beat: float, blocked: float):
+        """Capture the loop thread's stack and the command responsible for a stall"""
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+        
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        command, guild, channel = self.active_commands.get(task, (None, None, None))
+        
+        stall = {
+            'time': datetime.now(),
+            'blocked': blocked,
+            'ongoing': True,
+            'command': command,
+            'guild': guild,
+            'channel': channel,
+            'stack': stack
+        }
+        with self._lock:
+            if self.last_beat == beat:
+                self._open_stall = stall
+            else:
+                # The loop resumed while the stack was captured
+                stall['blocked'] = max(0.0, self.last_beat - beat - self.interval)
+                stall['ongoing'] = False
+            self.stalls.append(stall)
+        watchdog_logger.warning(
+            "Event loop blocked for %.2fs+ in command %s (guild %s, channel %s)\n%s",
+            blocked, command or 'unknown', guild or 'unknown', channel or 'unknown', stack
+        )
+
+def arrange_playlist(frequencies: Dict[str, int], min_gap: int = DEFAULT_MIN_GAP,
+                     deadline: Optional[float] = None) -> List[str]:
+    """Build a shuffled playlist outside the event loop (must stay picklable for the process pool)"""
+    return MoviePlaylist(None).create_smart_playlist(frequencies, min_gap, deadline)
+
+class RatingRecord:
+    """Compact record of a rated message (keeps no reference to the discord.Message)"""
+    __slots__ = ('message_id', 'jump_url', 'title', 'histogram', 'guild_id', 'channel_id', 'author_id',
+                 'created_at', 'reposts')
+    
+    def __init__(self, message_id: int, jump_url: str, title: str, ratings: List[int] = (),
+                 channel_id: Optional[int] = None, author_id: Optional[int] = None,
+                 created_at: Optional[datetime] = None, guild_id: Optional[int] = None):
+        self.message_id = message_id
+        self.jump_url = jump_url
+        self.title = title
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.created_at = created_at
+        self.reposts = ()  # Ids of other posts of the same movie merged into this record
+        self.set_ratings(ratings)
+    
+    @classmethod
+    def from_message(cls, message: discord.Message, title: str, ratings: List[int]) -> 'RatingRecord':
+        """Build a record from a message, copying only the fields we need"""
+        return cls(message.id, message.jump_url, title, ratings,
+                   message.channel.id, message.author.id, message.created_at,
+                   message.guild.id if message.guild else None)
+    
+    def set_ratings(self, ratings: List[int]):
+        """Replace the histogram with a new list of ratings"""
+        # histogram[r] is the number of votes with rating r (0-10)
+        self.histogram = array('I', [0] * 11)
+        for rating in ratings:
+            self.histogram[rating] += 1
+    
+    def add_repost(self, message_id: int):
+        """Remember another post of the same movie (link, title, poster and date stay this post's)"""
+        self.reposts = self.reposts + (message_id,)
+    
+    @property
+    def count(self) -> int:
+        return sum(self.histogram)
+    
+    @property
+    def average(self) -> Optional[float]:
+        count = self.count
+        if not count:
+            return None
+        return sum(rating * votes for rating, votes in enumerate(self.histogram)) / count
+    
+    @property
+    def ratings(self) -> List[int]:
+        """Individual ratings in ascending order"""
+        return [rating for rating, votes in enumerate(self.histogram) for _ in range(votes)]
+
+loop_watchdog = LoopWatchdog()
+
+# How to resolve a member reacting with several numbers on the same message:
+# 'latest' (last reaction in message order), 'highest' or 'average' (rounded)
+DUPLICATE_VOTE_POLICIES = ('latest', 'highest', 'average')
+DEFAULT_DUPLICATE_POLICY = 'latest'
+
+def resolve_duplicate_votes(ratings: List[int], policy: str = DEFAULT_DUPLICATE_POLICY) -> int:
+    """Collapse all ratings one member gave a message into a single rating"""
+    if policy == 'highest':
+        return max(ratings)
+    if policy == 'average':
+        # Round half up so the result still fits a 0-10 histogram bucket
+        return int(sum(ratings) / len(ratings) + 0.5)
+    return ratings[-1]
+
+class VoteIndex:
+    """Index of resolved votes by user and by message, filled while scanning reactions"""
+    
+    def __init__(self):
+        self.by_user = {}  # {user_id: {message_id: rating}}
+        self.by_message = {}  # {message_id: {user_id: rating}}
+        self.messages = {}  # {message_id: (guild_id, channel_id, title, jump_url)}
+        self.user_names = {}  # {(guild_id, user_id): display_name}
+    
+    def record(self, message: discord.Message, title: str, votes: Dict[int, int]):
+        """Store the votes for a message, replacing anything from a previous scan"""
+        for user_id in self.by_message.get(message.id, {}):
+            self.by_user.get(user_id, {}).pop(message.id, None)
+        
+        self.by_message[message.id] = dict(votes)
+        guild_id = message.guild.id if message.guild else None
+        self.messages[message.id] = (guild_id, message.channel.id, title, message.jump_url)
+        for user_id, rating in votes.items():
+            self.by_user.setdefault(user_id, {})[message.id] = rating
+    
+    def user_votes(self, user_id: int, guild_id: Optional[int], channel_id: Optional[int] = None) -> Dict[int, int]:
+        """Ratings given by a user in one guild: {message_id: rating}, optionally limited to one channel"""
+        return {message_id: rating for message_id, rating in self.by_user.get(user_id, {}).items()
+                if self.messages[message_id][0] == guild_id
+                and (channel_id is None or self.messages[message_id][1] == channel_id)}
+    
+    def message_guild(self, message_id: int) -> Optional[int]:
+        """Guild id of an indexed message (None for DMs or unknown messages)"""
+        return self.messages[message_id][0] if message_id in self.messages else None
+    
+    def message_votes(self, message_id: int) -> Dict[int, int]:
+        """Ratings on a message: {user_id: rating}"""
+        return dict(self.by_message.get(message_id, {}))
+    
+    def channel_voters(self, channel_id: int) -> set:
+        """Users who voted on at least one indexed message in a channel"""
+        return {user_id for message_id, votes in self.by_message.items()
+                if self.messages[message_id][1] == channel_id for user_id in votes}
+    
+    def missing_voters(self, message_id: int) -> set:
+        """Users who voted elsewhere in the message's channel but not on this message"""
+        if message_id not in self.messages:
+            return set()
+        channel_id = self.messages[message_id][1]
+        return self.channel_voters(channel_id) - set(self.by_message[message_id])
+
 class RatingBot:
-    def __init__(self, bot):
+    def __init__(self, bot, duplicate_policy: str = DEFAULT_DUPLICATE_POLICY):
         self.bot = bot
         self.numeric_emojis = {
             '0️⃣': 0, '1️⃣': 1, '2️⃣': 2, '3️⃣': 3, '4️⃣': 4,
             '5️⃣': 5, '6️⃣': 6, '7️⃣': 7, '8️⃣': 8, '9️⃣': 9, '🔟': 10
         }
+        self.default_duplicate_policy = duplicate_policy
+        self.duplicate_policies = {}  # {guild_id: policy chosen with !vote_policy}
+        self.vote_index = VoteIndex()
     
-    async def extract_numeric_reactions(self, message: discord.Message) -> List[int]:
-        """Extract numeric values from reactions (0-10)"""
-        ratings = []
+    def duplicate_policy(self, guild_id: Optional[int]) -> str:
+        """Duplicate vote policy of a guild, or the default if it hasn't chosen one"""
+        return self.duplicate_policies.get(guild_id, self.default_duplicate_policy)
+    
+    def reaction_rating(self, reaction: discord.Reaction) -> Optional[int]:
+        """Numeric value of a reaction (0-10), or None if it is not a rating"""
+        # Check for numeric emoji reactions
+        if str(reaction.emoji) in self.numeric_emojis:
+            return self.numeric_emojis[str(reaction.emoji)]
+        
+        # Check for custom numeric reactions (like :1:, :2:, etc.)
+        if hasattr(reaction.emoji, 'name'):
+            match = re.match(r'^(\d+)$', reaction.emoji.name)
+            if match:
+                rating = int(match.group(1))
+                if 0 <= rating <= 10:
+                    return rating
+        return None
+    
+    async def extract_numeric_reactions(self, message: discord.Message, title: Optional[str] = None) -> List[int]:
+        """Extract numeric values from reactions (0-10), one per member
+        
+        Members who reacted with several numbers are resolved with the guild's duplicate
+        policy, and the resolved votes are stored in the vote index.
+        """
+        await self.collect_user_ratings(message, title)
+        return list(self.vote_index.message_votes(message.id).values())
+    
+    async def collect_user_ratings(self, message: discord.Message,
+                                   title: Optional[str] = None) -> Dict[int, List[int]]:
+        """Every rating each member gave a message, in reaction order: {user_id: [ratings]}
+        
+        The votes resolved with the guild's duplicate policy are stored in the vote index.
+        """
+        user_ratings = {}  # {user_id: [ratings in reaction order]}
+        guild_id = message.guild.id if message.guild else None
         
         for reaction in message.reactions:
-            # Check for numeric emoji reactions
-            if str(reaction.emoji) in self.numeric_emojis:
-                rating = self.numeric_emojis[str(reaction.emoji)]
-                # Add the rating for each user who reacted (excluding the bot)
-                async for user in reaction.users():
-                    if not user.bot:
-                        ratings.append(rating)
+            rating = self.reaction_rating(reaction)
+            if rating is None:
+                continue
             
-            # Check for custom numeric reactions (like :1:, :2:, etc.)
-            elif hasattr(reaction.emoji, 'name'):
-                match = re.match(r'^(\d+)$', reaction.emoji.name)
-                if match:
-                    rating = int(match.group(1))
-                    if 0 <= rating <= 10:
-                        async for user in reaction.users():
-                            if not user.bot:
-                                ratings.append(rating)
-        
-        return ratings
+            # Collect the rating for each user who reacted (excluding the bot)
+            async for user in reaction.users():
+                if not user.bot:
+                    user_ratings.setdefault(user.id, []).append(rating)
+                    self.vote_index.user_names[(guild_id, user.id)] = user.display_name
+        
+        policy = self.duplicate_policy(guild_id)
+        votes = {user_id: resolve_duplicate_votes(ratings, policy)
+                 for user_id, ratings in user_ratings.items()}
+        self.vote_index.record(message, title if title is not None else message.content[:150], votes)
+        
+        return user_ratings
     
     def calculate_average(self, ratings: List[int]) -> Optional[float]:
         """Calculate average rating"""
@@ -52,31 +380,180 @@ class RatingBot:
             return None
         return sum(ratings) / len(ratings)
 
+class MovieIndex:
+    """In-memory indexes over scanned movie records for filtering and sorting without rescans"""
+    
+    SORT_KEYS = {
+        'average': lambda record: record.average if record.average is not None else -1.0,
+        'votes': lambda record: record.count,
+        'date': lambda record: record.created_at or datetime.min.replace(tzinfo=timezone.utc),
+        'title': lambda record: record.title.casefold()
+    }
+    
+    def __init__(self):
+        self.records = {}  # {message_id: RatingRecord}
+        self.by_guild = {}  # {guild_id: set(message_id)}
+        self.by_channel = {}  # {channel_id: set(message_id)}
+        self.by_poster = {}  # {author_id: set(message_id)}
+        self.poster_names = {}  # {(guild_id, author_id): display_name}
+        self._sorted = {}  # {guild_id: {field: (sorted keys, message_ids in the same order)}}, rebuilt lazily
+    
+    def add(self, record: RatingRecord, poster_name: Optional[str] = None):
+        """Add or replace the record for a message"""
+        # Drop the old record for this message and for any repost merged into it
+        for message_id in (record.message_id,) + record.reposts:
+            old = self.records.pop(message_id, None)
+            if old is not None:
+                self._sorted.pop(old.guild_id, None)
+                self.by_guild.get(old.guild_id, set()).discard(old.message_id)
+                self.by_channel.get(old.channel_id, set()).discard(old.message_id)
+                self.by_poster.get(old.author_id, set()).discard(old.message_id)
+        
+        self.records[record.message_id] = record
+        self.by_guild.setdefault(record.guild_id, set()).add(record.message_id)
+        self.by_channel.setdefault(record.channel_id, set()).add(record.message_id)
+        self.by_poster.setdefault(record.author_id, set()).add(record.message_id)
+        if poster_name:
+            self.poster_names[(record.guild_id, record.author_id)] = poster_name
+        # Only this guild's sorted indexes are out of date
+        self._sorted.pop(record.guild_id, None)
+    
+    def _sorted_index(self, guild_id: Optional[int], field: str):
+        """A guild's records sorted by one field, built once per batch of updates to that guild"""
+        guild_sorted = self._sorted.setdefault(guild_id, {})
+        if field not in guild_sorted:
+            key = self.SORT_KEYS[field]
+            ordered = sorted((self.records[message_id] for message_id in self.by_guild.get(guild_id, ())), key=key)
+            guild_sorted[field] = ([key(record) for record in ordered], [record.message_id for record in ordered])
+        return guild_sorted[field]
+    
+    def _range(self, guild_id: Optional[int], field: str, low=None, high=None):
+        """A guild's message ids sorted by field, and the slice [start, end) lying in [low, high]
+        
+        Either bound may be None. Returning the slice bounds lets callers count the matches
+        without copying them.
+        """
+        keys, message_ids = self._sorted_index(guild_id, field)
+        start = bisect_left(keys, low) if low is not None else 0
+        end = bisect_right(keys, high) if high is not None else len(keys)
+        return message_ids, start, end
+    
+    def guild_size(self, guild_id: Optional[int]) -> int:
+        """Number of movies indexed for a guild"""
+        return len(self.by_guild.get(guild_id, ()))
+    
+    def query(self, guild_id: Optional[int], channel_id: Optional[int] = None, poster_id: Optional[int] = None,
+              min_average: Optional[float] = None, max_average: Optional[float] = None,
+              min_votes: Optional[int] = None, max_votes: Optional[int] = None,
+              posted_after: Optional[datetime] = None, posted_before: Optional[datetime] = None,
+              sort: str = 'average', descending: bool = True, limit: Optional[int] = None) -> List[RatingRecord]:
+        """Filter and sort the movies of one guild; all bounds are inclusive
+        
+        Movies without ratings are excluded as soon as an average bound is given.
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort field: {sort}")
+        
+        # Results never cross guilds
+        candidates = [self.by_guild.get(guild_id, set())]
+        if channel_id is not None:
+            candidates.append(self.by_channel.get(channel_id, set()))
+        if poster_id is not None:
+            candidates.append(self.by_poster.get(poster_id, set()))
+        bounds = []  # [(field, low, high)]
+        if min_average is not None or max_average is not None:
+            bounds.append(('average', min_average if min_average is not None else 0.0, max_average))
+        if min_votes is not None or max_votes is not None:
+            bounds.append(('votes', min_votes, max_votes))
+        if posted_after is not None or posted_before is not None:
+            bounds.append(('date', posted_after, posted_before))
+        
+        # Intersect starting from the smallest set
+        candidates.sort(key=len)
+        matches = set(candidates[0]).intersection(*candidates[1:])
+        for field, low, high in bounds:
+            message_ids, start, end = self._range(guild_id, field, low, high)
+            if end - start < len(matches):
+                matches.intersection_update(message_ids[start:end])
+            else:
+                # Fewer matches than ids in range: check the field of each match instead
+                key = self.SORT_KEYS[field]
+                matches = {message_id for message_id in matches
+                           if (low is None or key(self.records[message_id]) >= low)
+                           and (high is None or key(self.records[message_id]) <= high)}
+        results = sorted((self.records[message_id] for message_id in matches),
+                         key=self.SORT_KEYS[sort], reverse=descending)
+        
+        return results[:limit] if limit is not None else results
+
 class MoviePlaylist:
     def __init__(self, rating_bot):
         self.rating_bot = rating_bot
-        self.movies = {}  # Store movie data: {movie_title: {'ratings': [], 'average': float, 'count': int}}
+        self.movies = {}  # Store movie data: {movie_title: RatingRecord}
+        self.movie_index = MovieIndex()  # Every movie scanned so far, for !query
     
-    async def analyze_movie_ratings(self, channel, limit: int = 100) -> Dict[str, Dict]:
-        """Analyze ratings for all movies in a channel"""
+    async def analyze_movie_ratings(self, channel, limit: int = 100) -> Dict[str, RatingRecord]:
+        """Analyze ratings for all movies in a channel
+        
+        Reposts of the same movie (same normalized title) are merged into the record of the
+        most recent post. Each member counts once across all posts, resolved with the
+        duplicate policy as if all their ratings were on one message.
+        """
         movie_data = {}
+        canonical_titles = {}  # {normalized title: title used as key in movie_data}
+        post_ratings = {}  # {normalized title: [{user_id: [ratings]} for each post, newest first]}
         
         async for message in channel.history(limit=limit):
             if message.content and not message.author.bot:  # Exclude bot messages
                 # Extract movie title from message content
                 movie_title = self.extract_movie_title(message.content)
                 if movie_title:
-                    ratings = await self.rating_bot.extract_numeric_reactions(message)
-                    # Include ALL movies, even those with no reactions at all
-                    movie_data[movie_title] = {
-                        'ratings': ratings,
-                        'average': self.rating_bot.calculate_average(ratings) if ratings else None,
-                        'count': len(ratings),
-                        'message': message
-                    }
+                    user_ratings = await self.rating_bot.collect_user_ratings(message, movie_title)
+                    ratings = list(self.rating_bot.vote_index.message_votes(message.id).values())
+                    guild_id = message.guild.id if message.guild else None
+                    self.movie_index.poster_names[(guild_id, message.author.id)] = message.author.display_name
+                    
+                    key = self.normalize_title(movie_title)
+                    if key in canonical_titles:
+                        movie_data[canonical_titles[key]].add_repost(message.id)
+                        post_ratings[key].append(user_ratings)
+                    else:
+                        # Include ALL movies, even those with no reactions at all
+                        canonical_titles[key] = movie_title
+                        movie_data[movie_title] = RatingRecord.from_message(message, movie_title, ratings)
+                        post_ratings[key] = [user_ratings]
+        
+        # Reposted movies: one vote per member, resolved once over all their ratings on every post
+        for key, ratings_per_post in post_ratings.items():
+            if len(ratings_per_post) > 1:
+                user_ratings = {}  # {user_id: [ratings, oldest post first]}
+                for post in reversed(ratings_per_post):
+                    for user_id, ratings in post.items():
+                        user_ratings.setdefault(user_id, []).extend(ratings)
+                record = movie_data[canonical_titles[key]]
+                policy = self.rating_bot.duplicate_policy(record.guild_id)
+                record.set_ratings([resolve_duplicate_votes(ratings, policy) for ratings in user_ratings.values()])
+        
+        for record in movie_data.values():
+            self.movie_index.add(record)
         
         return movie_data
     
+    def normalize_title(self, title: str) -> str:
+        """Canonical form of a movie title for matching reposts
+        
+        Case-folds, removes accents, a year in brackets like "(1986)" and punctuation,
+        so "Aliens" and "aliens (1986)" map to the same key.
+        """
+        normalized = unicodedata.normalize('NFKD', title.casefold())
+        normalized = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+        without_year = re.sub(r'[\(\[]\s*(?:19|20)\d{2}\s*[\)\]]', ' ', normalized)
+        words = re.findall(r'\w+', without_year)
+        if not words:
+            # Titles made only of a year or punctuation keep their folded text
+            words = re.findall(r'\w+', normalized) or [normalized.strip()]
+        return ' '.join(words)
+    
     def extract_movie_title(self, message_content: str) -> Optional[str]:
         """Extract movie title from message content"""
         title = message_content.strip()
@@ -106,13 +583,13 @@ class MoviePlaylist:
                 
         return title
     
-    def calculate_playlist_frequency(self, movie_data: Dict[str, Dict], default_frequency: int = 3) -> Dict[str, int]:
+    def calculate_playlist_frequency(self, movie_data: Dict[str, RatingRecord], default_frequency: int = 3) -> Dict[str, int]:
         """Calculate how many times each movie should appear in playlist"""
         playlist_frequencies = {}
         
-        for title, data in movie_data.items():
-            count = data['count']
-            average = data['average']
+        for title, record in movie_data.items():
+            count = record.count
+            average = record.average
             
             if count < 3:
                 # Less than 3 ratings: appears default_frequency times
@@ -134,7 +611,8 @@ class MoviePlaylist:
         
         return playlist_frequencies
     
-    def create_smart_playlist(self, frequencies: Dict[str, int]) -> List[str]:
+    def create_smart_playlist(self, frequencies: Dict[str, int], min_gap: int = DEFAULT_MIN_GAP,
+                              deadline: Optional[float] = None) -> List[str]:
         """Create a smart shuffled playlist with optimal distribution"""
         if not frequencies:
             return []
@@ -150,10 +628,45 @@ class MoviePlaylist:
             playlist.extend([title] * frequency)
         
         # Smart shuffle: distribute repeated movies evenly
-        return self.smart_shuffle(playlist)
+        return self.smart_shuffle(playlist, min_gap, deadline)
     
-    def smart_shuffle(self, playlist: List[str]) -> List[str]:
-        """Shuffle playlist ensuring all movies play before any repeats and no consecutive duplicates"""
+    async def create_smart_playlist_async(self, frequencies: Dict[str, int], min_gap: int = DEFAULT_MIN_GAP,
+                                          timeout: float = PLAYLIST_TIMEOUT) -> List[str]:
+        """Create a smart playlist without blocking the event loop for large playlists
+        
+        Small playlists are arranged inline. Playlists with PLAYLIST_OFFLOAD_THRESHOLD or more
+        entries run in the process pool; asyncio.TimeoutError is raised after `timeout` seconds.
+        A running worker can't be interrupted from here, so the job gets the same deadline and
+        gives up on its own between rounds once it passes. A job whose command is cancelled
+        keeps running until it finishes or reaches that deadline.
+        
+        If a worker process dies the pool is broken for good, so it is replaced and the job
+        retried once; BrokenProcessPool is raised if the fresh pool breaks as well.
+        """
+        total_entries = sum(freq for freq in frequencies.values() if freq > 0)
+        if total_entries < PLAYLIST_OFFLOAD_THRESHOLD:
+            return self.create_smart_playlist(frequencies, min_gap)
+        
+        loop = asyncio.get_running_loop()
+        deadline = time.time() + timeout
+        for attempt in range(2):
+            executor = get_playlist_executor()
+            try:
+                future = loop.run_in_executor(executor, arrange_playlist, frequencies, min_gap, deadline)
+                return await asyncio.wait_for(future, timeout=deadline - time.time())
+            except BrokenProcessPool:
+                shutdown_playlist_executor(executor, wait=False)
+                if attempt == 1:
+                    raise
+    
+    def smart_shuffle(self, playlist: List[str], min_gap: int = DEFAULT_MIN_GAP,
+                      deadline: Optional[float] = None) -> List[str]:
+        """Shuffle playlist ensuring all movies play before any repeats and no consecutive duplicates
+        
+        Repeats of the same movie are kept at least `min_gap` other entries apart when possible,
+        otherwise as far apart as the round structure allows. Raises TimeoutError if `deadline`
+        (a time.time() value) passes before the arrangement is done.
+        """
         if len(playlist) <= 1:
             return playlist
         
@@ -167,6 +680,7 @@ class MoviePlaylist:
         max_frequency = max(movie_counts.values())
         
         result = []
+        last_played = {}  # {movie: position of its latest entry in result}
         
         # Create rounds where each movie appears once per round
         for round_num in range(max_frequency):
@@ -180,25 +694,11 @@ class MoviePlaylist:
             if not round_movies:
                 break
             
-            # Shuffle this round to avoid predictable patterns
-            random.shuffle(round_movies)
-            
-            # Ensure no consecutive duplicates between rounds
-            attempts = 0
-            while result and round_movies and result[-1] == round_movies[0] and len(round_movies) > 1 and attempts < 10:
-                # Try different shuffles until we avoid consecutive duplicates
-                random.shuffle(round_movies)
-                attempts += 1
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError("Playlist arrangement passed its deadline")
             
-            # If we still have a consecutive duplicate after shuffling, manually fix it
-            if result and round_movies and result[-1] == round_movies[0] and len(round_movies) > 1:
-                # Find a different movie to put first
-                for i in range(1, len(round_movies)):
-                    if round_movies[i] != result[-1]:
-                        round_movies[0], round_movies[i] = round_movies[i], round_movies[0]
-                        break
-            
-            result.extend(round_movies)
+            remaining = {movie: movie_counts[movie] - round_num - 1 for movie in round_movies}
+            self.arrange_round(round_movies, result, last_played, min_gap, remaining)
         
         # Final check: ensure no consecutive duplicates in the entire playlist
         final_result = []
@@ -224,6 +724,40 @@ class MoviePlaylist:
         
         return final_result
     
+    def arrange_round(self, round_movies: List[str], result: List[str], last_played: Dict[str, int],
+                      min_gap: int, remaining: Optional[Dict[str, int]] = None):
+        """Append one round to result while respecting the minimum gap
+        
+        Each slot takes, among movies played more than `min_gap` entries ago, the one with the
+        most appearances left after this round (ties broken at random). Movies that carry on
+        into later rounds are thus placed early, and movies that are done fill the end of the
+        round as a buffer before the next one. When no movie qualifies, the least recently
+        played movie is used. Runs in O(n log n) for a round of n movies.
+        """
+        remaining = remaining or {}
+        
+        def ready_entry(movie):
+            # heapq is a min-heap: most appearances left first, random among ties
+            return (-remaining.get(movie, 0), random.random(), movie)
+        
+        # Movies never played are ready at once; the rest wait in order of their last play
+        ready = [ready_entry(movie) for movie in round_movies if movie not in last_played]
+        heapq.heapify(ready)
+        cooling = deque(sorted((movie for movie in round_movies if movie in last_played), key=last_played.get))
+        
+        for _ in range(len(round_movies)):
+            position = len(result)
+            while cooling and last_played[cooling[0]] < position - min_gap:
+                heapq.heappush(ready, ready_entry(cooling.popleft()))
+            
+            if ready:
+                movie = heapq.heappop(ready)[2]
+            else:
+                movie = cooling.popleft()
+            
+            last_played[movie] = position
+            result.append(movie)
+    
     def backtrack_shuffle(self, playlist: List[str], movie_counts: Dict[str, int]) -> Optional[List[str]]:
         """Use backtracking to find a valid arrangement with no consecutive duplicates"""
         remaining = dict(movie_counts)
@@ -295,9 +829,18 @@ movie_playlist = MoviePlaylist(rating_bot)
 
 @bot.event
 async def on_ready():
+    loop_watchdog.start(asyncio.get_running_loop())
     print(f'{bot.user} has connected to Discord!')
     print(f'Bot is ready to analyze ratings in channels.')
 
+@bot.before_invoke
+async def track_command(ctx):
+    loop_watchdog.track_command(ctx)
+
+@bot.after_invoke
+async def untrack_command(ctx):
+    loop_watchdog.untrack_command()
+
 @bot.command(name='analyze_ratings')
 async def analyze_channel_ratings(ctx, channel_id: int = None, limit: int = 100):
     """
@@ -325,13 +868,7 @@ async def analyze_channel_ratings(ctx, channel_id: int = None, limit: int = 100)
             if message.reactions:
                 ratings = await rating_bot.extract_numeric_reactions(message)
                 if ratings:
-                    avg_rating = rating_bot.calculate_average(ratings)
-                    message_ratings.append({
-                        'message': message,
-                        'ratings': ratings,
-                        'average': avg_rating,
-                        'count': len(ratings)
-                    })
+                    message_ratings.append(RatingRecord.from_message(message, message.content, ratings))
                     total_ratings.extend(ratings)
         
         if not message_ratings:
@@ -360,16 +897,16 @@ async def analyze_channel_ratings(ctx, channel_id: int = None, limit: int = 100)
         
         # Add top rated messages
         if message_ratings:
-            sorted_messages = sorted(message_ratings, key=lambda x: x['average'], reverse=True)
+            sorted_messages = sorted(message_ratings, key=lambda x: x.average, reverse=True)
             top_messages = sorted_messages[:5]
             
             top_messages_text = ""
-            for i, msg_data in enumerate(top_messages, 1):
-                message_preview = msg_data['message'].content[:50] + "..." if len(msg_data['message'].content) > 50 else msg_data['message'].content
+            for i, record in enumerate(top_messages, 1):
+                message_preview = record.title[:50] + "..." if len(record.title) > 50 else record.title
                 if not message_preview.strip():
                     message_preview = "[Media/Embed content]"
                 
-                top_messages_text += f"**{i}.** {msg_data['average']:.2f}/10 ({msg_data['count']} ratings)\n"
+                top_messages_text += f"**{i}.** {record.average:.2f}/10 ({record.count} ratings)\n"
                 top_messages_text += f"└ {message_preview}\n\n"
             
             embed.add_field(
@@ -397,14 +934,15 @@ async def rate_specific_message(ctx, message_id: int):
             await ctx.send("❌ No numeric ratings (0-10) found on this message.")
             return
         
-        average = rating_bot.calculate_average(ratings)
+        record = RatingRecord.from_message(message, message.content, ratings)
+        average = record.average
         
         embed = discord.Embed(
             title="📊 Message Rating Analysis",
             color=0x00ff00
         )
         
-        message_preview = message.content[:100] + "..." if len(message.content) > 100 else message.content
+        message_preview = record.title[:100] + "..." if len(record.title) > 100 else record.title
         if not message_preview.strip():
             message_preview = "[Media/Embed content]"
         
@@ -417,14 +955,14 @@ async def rate_specific_message(ctx, message_id: int):
         embed.add_field(
             name="📈 Rating Statistics",
             value=f"**Average Rating:** {average:.2f}/10\n"
-                  f"**Total Ratings:** {len(ratings)}\n"
-                  f"**Individual Ratings:** {', '.join(map(str, sorted(ratings)))}",
+                  f"**Total Ratings:** {record.count}\n"
+                  f"**Individual Ratings:** {', '.join(map(str, record.ratings))}",
             inline=False
         )
         
         embed.add_field(
             name="🔗 Message Link",
-            value=f"[Jump to Message]({message.jump_url})",
+            value=f"[Jump to Message]({record.jump_url})",
             inline=False
         )
         
@@ -436,11 +974,13 @@ async def rate_specific_message(ctx, message_id: int):
         await ctx.send(f"❌ An error occurred: {str(e)}")
 
 @bot.command(name='create_playlist')
-async def create_movie_playlist(ctx, channel_id: int = None, limit: int = 100, default_frequency: int = 3):
+async def create_movie_playlist(ctx, channel_id: int = None, limit: int = 100, default_frequency: int = 3,
+                                min_gap: int = DEFAULT_MIN_GAP):
     """
     Create a movie playlist based on ratings
-    Usage: !create_playlist [channel_id] [limit] [default_frequency]
+    Usage: !create_playlist [channel_id] [limit] [default_frequency] [min_gap]
     default_frequency: How many times unrated/low-rated movies appear (default: 3)
+    min_gap: Minimum number of other movies between repeats of the same movie (default: 1)
     """
     try:
         # Validate default_frequency
@@ -448,6 +988,11 @@ async def create_movie_playlist(ctx, channel_id: int = None, limit: int = 100, d
             await ctx.send("❌ Default frequency must be between 1 and 10.")
             return
         
+        # Validate min_gap
+        if min_gap < 0:
+            await ctx.send("❌ Minimum gap cannot be negative.")
+            return
+        
         # Use current channel if no channel_id provided
         if channel_id is None:
             channel = ctx.channel
@@ -469,8 +1014,15 @@ async def create_movie_playlist(ctx, channel_id: int = None, limit: int = 100, d
         # Calculate playlist frequencies
         frequencies = movie_playlist.calculate_playlist_frequency(movie_data, default_frequency)
         
-        # Create smart playlist
-        playlist = movie_playlist.create_smart_playlist(frequencies)
+        # Create smart playlist (large playlists are arranged off the event loop)
+        try:
+            playlist = await movie_playlist.create_smart_playlist_async(frequencies, min_gap)
+        except asyncio.TimeoutError:
+            await ctx.send(f"❌ Playlist creation took longer than {PLAYLIST_TIMEOUT} seconds and was cancelled.")
+            return
+        except BrokenProcessPool:
+            await ctx.send("❌ The playlist worker process crashed. Please try again.")
+            return
         
         if not playlist:
             await ctx.send("❌ No movies qualify for the playlist (all rated below 5.0).")
@@ -493,7 +1045,8 @@ async def create_movie_playlist(ctx, channel_id: int = None, limit: int = 100, d
             value=f"**Total Movies Found:** {total_movies}\n"
                   f"**Movies in Playlist:** {playlist_movies}\n"
                   f"**Playlist Length:** {total_playlist_length}\n"
-                  f"**Default Frequency:** {default_frequency}x",
+                  f"**Default Frequency:** {default_frequency}x\n"
+                  f"**Minimum Gap:** {min_gap}",
             inline=False
         )
         
@@ -501,11 +1054,11 @@ async def create_movie_playlist(ctx, channel_id: int = None, limit: int = 100, d
         freq_text = ""
         for title, freq in sorted(frequencies.items(), key=lambda x: x[1], reverse=True):
             if freq > 0:
-                movie_info = movie_data[title]
-                if movie_info['count'] >= 3:
-                    avg_str = f" (avg: {movie_info['average']:.1f})"
+                record = movie_data[title]
+                if record.count >= 3:
+                    avg_str = f" (avg: {record.average:.1f})"
                 else:
-                    avg_str = f" ({movie_info['count']} ratings)"
+                    avg_str = f" ({record.count} ratings)"
                 
                 freq_text += f"**{freq}x** {title[:40]}{'...' if len(title) > 40 else ''}{avg_str}\n"
         
@@ -572,15 +1125,16 @@ async def movie_statistics(ctx, channel_id: int = None, limit: int = 100):
         excluded_movies = []
         included_movies = []
         
-        for title, data in movie_data.items():
-            if data['count'] == 0:
+        for title, record in movie_data.items():
+            count = record.count
+            if count == 0:
                 no_ratings.append(title)
-            elif data['count'] < 3:
-                insufficient_ratings.append((title, data['count']))
-            elif data['average'] < 5.0:
-                excluded_movies.append((title, data['average'], data['count']))
+            elif count < 3:
+                insufficient_ratings.append((title, count))
+            elif record.average < 5.0:
+                excluded_movies.append((title, record.average, count))
             else:
-                included_movies.append((title, data['average'], data['count']))
+                included_movies.append((title, record.average, count))
         
         # Create detailed embed
         embed = discord.Embed(
@@ -630,6 +1184,258 @@ async def movie_statistics(ctx, channel_id: int = None, limit: int = 100):
     except Exception as e:
         await ctx.send(f"❌ An error occurred: {str(e)}")
 
+QUERY_FIELDS = {'avg': 'average', 'average': 'average', 'votes': 'votes', 'count': 'votes',
+                'date': 'date', 'posted': 'date'}
+
+def parse_query_terms(terms: List[str]) -> Dict:
+    """Turn `!query` terms like avg>=7 votes>5 posted<2024-01-01 into MovieIndex.query arguments"""
+    filters = {}
+    for term in terms:
+        match = re.match(r'^(\w+)\s*(>=|<=|=|>|<)\s*(.+)$', term)
+        if not match:
+            raise ValueError(f"Can't understand `{term}`")
+        field, op, value = match.group(1).lower(), match.group(2), match.group(3)
+        
+        if field in ('poster', 'channel'):
+            ids = re.findall(r'\d+', value)
+            if op != '=' or not ids:
+                raise ValueError(f"Use {field}=<mention or id>")
+            filters['poster_id' if field == 'poster' else 'channel_id'] = int(ids[0])
+        elif field in ('sort', 'order', 'limit') and op != '=':
+            raise ValueError(f"Use {field}=<value>")
+        elif field == 'sort':
+            filters['sort'] = QUERY_FIELDS.get(value.lower(), value.lower())
+        elif field == 'order':
+            filters['descending'] = value.lower() != 'asc'
+        elif field == 'limit':
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError("limit must be a positive number")
+            filters['limit'] = int(value)
+        elif field in QUERY_FIELDS:
+            name = QUERY_FIELDS[field]
+            if name == 'date':
+                low = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+                # Dates cover the whole day; strict bounds step past it
+                high = low + timedelta(days=1) - timedelta(microseconds=1)
+                step = timedelta(microseconds=1)
+                min_key, max_key = 'posted_after', 'posted_before'
+            elif name == 'votes':
+                low = high = int(value)
+                step = 1
+                min_key, max_key = 'min_votes', 'max_votes'
+            else:
+                low = high = float(value)
+                step = 1e-9
+                min_key, max_key = 'min_average', 'max_average'
+            
+            if op in ('>=', '='):
+                filters[min_key] = low
+            if op in ('<=', '='):
+                filters[max_key] = high
+            if op == '>':
+                filters[min_key] = high + step
+            if op == '<':
+                filters[max_key] = low - step
+        else:
+            raise ValueError(f"Unknown field `{field}`")
+    return filters
+
+@bot.command(name='query')
+async def query_movies(ctx, *terms: str):
+    """
+    Filter and sort scanned movies without rescanning the channel
+    Usage: !query [avg>=7] [votes>=5] [poster=@user] [channel=#channel] [posted<YYYY-MM-DD] [sort=average|votes|date|title] [order=asc|desc] [limit=10]
+    """
+    try:
+        filters = parse_query_terms(list(terms))
+    except ValueError as e:
+        await ctx.send(f"❌ Invalid query: {str(e)}. Example: `!query avg>=7 votes>=5 posted<2024-01-01 sort=votes`")
+        return
+    
+    limit = filters.pop('limit', 10)
+    index = movie_playlist.movie_index
+    guild_id = ctx.guild.id if ctx.guild else None
+    if not index.guild_size(guild_id):
+        await ctx.send("❌ No movies indexed yet. Run `!movie_stats` or `!create_playlist` first.")
+        return
+    
+    # Only channels of this server can be queried
+    if 'channel_id' in filters:
+        channel = bot.get_channel(filters['channel_id'])
+        if channel is None or getattr(getattr(channel, 'guild', None), 'id', None) != guild_id:
+            await ctx.send(f"❌ Channel with ID {filters['channel_id']} not found in this server.")
+            return
+    
+    try:
+        results = index.query(guild_id, **filters)
+    except ValueError as e:
+        await ctx.send(f"❌ Invalid query: {str(e)}.")
+        return
+    
+    if not results:
+        await ctx.send("❌ No movies match this query.")
+        return
+    
+    embed = discord.Embed(
+        title="🔎 Movie Query",
+        description=f"**Matches:** {len(results)} of {index.guild_size(guild_id)} indexed movies",
+        color=0x00bfff
+    )
+    
+    results_text = ""
+    for record in results[:limit]:
+        avg_str = f"{record.average:.1f}/10" if record.average is not None else "unrated"
+        poster = index.poster_names.get((guild_id, record.author_id), "unknown")
+        posted = f"{record.created_at:%Y-%m-%d}" if record.created_at else "?"
+        results_text += (f"**{avg_str}** [{record.title[:40]}{'...' if len(record.title) > 40 else ''}]({record.jump_url})"
+                         f" ({record.count} ratings) – {poster}, {posted}\n")
+    
+    embed.add_field(
+        name="🎬 Results",
+        value=results_text[:1024],  # Discord field limit
+        inline=False
+    )
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='my_ratings')
+async def member_ratings(ctx, member: discord.Member = None):
+    """
+    Show the ratings a member has given, from the vote index (no rescan)
+    Usage: !my_ratings [member]
+    """
+    member = member or ctx.author
+    # Only ratings given in this server
+    guild_id = ctx.guild.id if ctx.guild else None
+    votes = rating_bot.vote_index.user_votes(member.id, guild_id)
+    
+    if not votes:
+        await ctx.send(f"❌ No indexed ratings for {member.display_name}. "
+                       f"Run `!analyze_ratings`, `!movie_stats` or `!create_playlist` first.")
+        return
+    
+    embed = discord.Embed(
+        title=f"🗳️ Ratings by {member.display_name}",
+        description=f"**Rated Messages:** {len(votes)}\n"
+                    f"**Average Given:** {rating_bot.calculate_average(list(votes.values())):.2f}/10\n"
+                    f"**Duplicate Policy:** {rating_bot.duplicate_policy(guild_id)}",
+        color=0x00ff00
+    )
+    
+    votes_text = ""
+    for message_id, rating in sorted(votes.items(), key=lambda x: x[1], reverse=True):
+        _, _, title, jump_url = rating_bot.vote_index.messages[message_id]
+        title = title or "[Media/Embed content]"
+        votes_text += f"**{rating}/10** [{title[:40]}{'...' if len(title) > 40 else ''}]({jump_url})\n"
+    
+    embed.add_field(
+        name="🎬 Ratings",
+        value=votes_text[:1024],  # Discord field limit
+        inline=False
+    )
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='missing_votes')
+async def missing_votes(ctx, message_id: int):
+    """
+    Show members who voted in the channel but not on a given message (no rescan)
+    Usage: !missing_votes <message_id>
+    """
+    index = rating_bot.vote_index
+    guild_id = ctx.guild.id if ctx.guild else None
+    # Messages from other servers are treated as unknown
+    if message_id not in index.messages or index.message_guild(message_id) != guild_id:
+        await ctx.send("❌ Message not in the vote index. Scan its channel first.")
+        return
+    
+    _, _, title, jump_url = index.messages[message_id]
+    missing = index.missing_voters(message_id)
+    
+    embed = discord.Embed(
+        title="🗳️ Missing Votes",
+        description=f"[{(title or '[Media/Embed content]')[:100]}]({jump_url})",
+        color=0x00bfff
+    )
+    
+    embed.add_field(
+        name="📈 Votes",
+        value=f"**Voted:** {len(index.by_message[message_id])}\n"
+              f"**Not Voted Yet:** {len(missing)}",
+        inline=False
+    )
+    
+    if missing:
+        names = sorted(index.user_names.get((guild_id, user_id), str(user_id)) for user_id in missing)
+        embed.add_field(
+            name="⏳ Haven't Voted",
+            value=", ".join(names)[:1024],  # Discord field limit
+            inline=False
+        )
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='vote_policy')
+@commands.has_permissions(administrator=True)
+async def vote_policy(ctx, policy: str = None):
+    """
+    Show or set how multiple ratings from one member on a message are resolved in this server
+    Usage: !vote_policy [latest|highest|average]
+    """
+    guild_id = ctx.guild.id if ctx.guild else None
+    if policy is None:
+        await ctx.send(f"🗳️ Duplicate vote policy: **{rating_bot.duplicate_policy(guild_id)}**")
+        return
+    
+    policy = policy.lower()
+    if policy not in DUPLICATE_VOTE_POLICIES:
+        await ctx.send(f"❌ Policy must be one of: {', '.join(DUPLICATE_VOTE_POLICIES)}.")
+        return
+    
+    rating_bot.duplicate_policies[guild_id] = policy
+    await ctx.send(f"✅ Duplicate vote policy for this server set to **{policy}**. It applies from the next scan.")
+
+@bot.command(name='loop_stats')
+@commands.has_permissions(administrator=True)
+async def loop_statistics(ctx, count: int = 3):
+    """
+    Show event-loop lag and the most recent stalls (administrators only)
+    Usage: !loop_stats [count]
+    count: Number of recent stalls to show (default: 3, max: 5)
+    """
+    # Each stall field can be ~1 KB and Discord rejects embeds over 6000 characters
+    count = min(count, LOOP_STATS_MAX_STALLS)
+    
+    embed = discord.Embed(
+        title="⏱️ Event Loop Watchdog",
+        description=f"Stalls of {loop_watchdog.threshold:.1f}s or more are logged to `{loop_watchdog.log_file}`",
+        color=0xffa500
+    )
+    
+    embed.add_field(
+        name="📈 Lag",
+        value=f"**Current Lag:** {loop_watchdog.current_lag * 1000:.0f} ms\n"
+              f"**Max Lag:** {loop_watchdog.max_lag * 1000:.0f} ms\n"
+              f"**Recorded Stalls:** {len(loop_watchdog.stalls)}",
+        inline=False
+    )
+    
+    recent_stalls = list(loop_watchdog.stalls)[-count:] if count > 0 else []
+    for stall in reversed(recent_stalls):
+        header = (f"**Command:** {stall['command'][:100] if stall['command'] else 'unknown'}\n"
+                  f"**Guild:** {stall['guild'][:100] if stall['guild'] else 'unknown'}\n"
+                  f"**Channel:** {stall['channel'][:100] if stall['channel'] else 'unknown'}\n")
+        # Show the innermost frames, they point at the blocking code
+        stack_tail = stall['stack'][-(1024 - len(header) - len("```\n\n```")):]
+        embed.add_field(
+            name=f"🐢 {stall['time']:%Y-%m-%d %H:%M:%S} – blocked {stall['blocked']:.2f}s"
+                 f"{'+ (ongoing)' if stall['ongoing'] else ''}",
+            value=f"{header}```\n{stack_tail}\n```",
+            inline=False
+        )
+    
+    await ctx.send(embed=embed)
+
 @bot.command(name='help_ratings')
 async def help_ratings(ctx):
     """Show help for rating commands"""
@@ -645,18 +1451,29 @@ async def help_ratings(ctx):
               "└ Analyze ratings in a channel\n\n"
               "**!rate_message <message_id>**\n"
               "└ Analyze ratings for a specific message\n\n"
+              "**!my_ratings [member]**\n"
+              "└ Show the ratings a member has given\n\n"
+              "**!missing_votes <message_id>**\n"
+              "└ Show who hasn't rated a message yet\n\n"
+              "**!vote_policy [latest|highest|average]**\n"
+              "└ How multiple ratings from one member are counted (admins only)\n\n"
               "**!help_ratings**\n"
-              "└ Show this help message",
+              "└ Show this help message\n\n"
+              "**!loop_stats [count]**\n"
+              "└ Show event-loop lag and recent stalls (admins only)",
         inline=False
     )
     
     embed.add_field(
         name="🎬 Movie Playlist Commands",
-        value="**!create_playlist [channel_id] [limit] [default_frequency]**\n"
+        value="**!create_playlist [channel_id] [limit] [default_frequency] [min_gap]**\n"
               "└ Create smart shuffled movie playlist\n"
-              "└ default_frequency: How many times unrated movies appear (default: 3)\n\n"
+              "└ default_frequency: How many times unrated movies appear (default: 3)\n"
+              "└ min_gap: Other movies between repeats of the same movie (default: 1)\n\n"
               "**!movie_stats [channel_id] [limit]**\n"
-              "└ Show detailed movie statistics",
+              "└ Show detailed movie statistics\n\n"
+              "**!query [avg>=7] [votes>=5] [poster=@user] [channel=#channel] [posted<YYYY-MM-DD] [sort=...]**\n"
+              "└ Filter and sort scanned movies without rescanning",
         inline=False
     )
     
@@ -676,6 +1493,7 @@ async def help_ratings(ctx):
               "• **≥ 3 ratings, avg 8.0-10.0:** Default + 2\n"
               "• **Round-based shuffling:** All movies play before any repeats\n"
               "• **No consecutive duplicates:** Perfect variety guaranteed\n"
+              "• **Minimum gap:** Repeats kept at least min_gap movies apart when possible\n"
               "• **Customizable:** Set default_frequency (1-10, default: 3)",
         inline=False
     )
@@ -691,6 +1509,8 @@ async def on_command_error(ctx, error):
         await ctx.send(f"❌ Missing required argument: {error.param}")
     elif isinstance(error, commands.BadArgument):
         await ctx.send("❌ Invalid argument provided.")
+    elif isinstance(error, commands.MissingPermissions):
+        await ctx.send("❌ You don't have permission to use this command.")
     else:
         await ctx.send(f"❌ An error occurred: {str(error)}")
 
@@ -709,4 +1529,7 @@ if __name__ == "__main__":
         print("Make sure to create a .env file with your token or set the environment variable")
     else:
         print("🤖 Starting Discord Rating Bot...")
-        bot.run(token)
\ No newline at end of file
+        try:
+            bot.run(token)
+        finally:
+            shutdown_playlist_executor()
\ No newline at end of file
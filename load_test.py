@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Load test for the bot's command handlers against a simulated Discord backend
+
+Runs overlapping !create_playlist, !analyze_ratings, !movie_stats and !query invocations
+across many simulated guilds and channels, without any network access, and reports
+command throughput, latency percentiles, memory growth, event-loop lag and throttled requests.
+
+Usage: python load_test.py [--guilds 20] [--channels 3] [--messages 50] [--commands 300] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import bot
+
+NUMERIC_EMOJIS = ['0️⃣', '1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
+PAGE_SIZE = 100  # Discord returns history and reaction users in pages of 100
+
+class RateLimiter:
+    """Token bucket per route, like discord.py's own rate-limit handling
+
+    A request that finds the bucket empty waits for the next token instead of getting
+    an HTTP 429, so `throttled` counts requests slowed down by the limit, not errors.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int, latency: float):
+        self.rate = requests_per_second
+        self.burst = burst
+        self.latency = latency
+        self.buckets = {}  # {route: (tokens, last_refill)}
+        self.requests = 0
+        self.throttled = 0
+
+    async def request(self, route):
+        """Simulate one API request on a route"""
+        self.requests += 1
+        now = time.monotonic()
+        tokens, last = self.buckets.get(route, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            # Out of tokens: wait for the bucket to refill
+            self.throttled += 1
+            wait = (1 - tokens) / self.rate
+            self.buckets[route] = (tokens - 1, now)
+            await asyncio.sleep(wait)
+        else:
+            self.buckets[route] = (tokens - 1, now)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class FakeUser:
+    def __init__(self, user_id: int, is_bot: bool = False):
+        self.id = user_id
+        self.bot = is_bot
+        self.display_name = f"user{user_id}"
+        self.name = self.display_name
+        self.mention = f"<@{user_id}>"
+
+class FakeReaction:
+    def __init__(self, limiter: RateLimiter, message, emoji: str, users):
+        self.limiter = limiter
+        self.message = message
+        self.emoji = emoji
+        self._users = users
+        self.count = len(users)
+
+    async def users(self):
+        for start in range(0, max(len(self._users), 1), PAGE_SIZE):
+            await self.limiter.request(('reactions', self.message.channel.id))
+            for user in self._users[start:start + PAGE_SIZE]:
+                yield user
+
+class FakeMessage:
+    def __init__(self, message_id: int, channel, author, content: str, created_at: datetime):
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.created_at = created_at
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{message_id}"
+        self.reactions = []
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+
+class FakeChannel:
+    def __init__(self, limiter: RateLimiter, guild: FakeGuild, channel_id: int):
+        self.limiter = limiter
+        self.guild = guild
+        self.id = channel_id
+        self.name = f"movies-{channel_id}"
+        self.mention = f"<#{channel_id}>"
+        self.messages = []  # Newest first, like channel.history()
+
+    async def history(self, limit: int = 100):
+        for start in range(0, min(limit, len(self.messages)), PAGE_SIZE):
+            await self.limiter.request(('history', self.id))
+            for message in self.messages[start:min(start + PAGE_SIZE, limit)]:
+                yield message
+
+    async def send(self, content=None, **kwargs):
+        await self.limiter.request(('send', self.id))
+
+class FakeCommand:
+    def __init__(self, name: str):
+        self.name = name
+        self.qualified_name = name
+
+class FakeContext:
+    """Minimal commands.Context: the handlers only use channel, author and send()"""
+
+    def __init__(self, channel: FakeChannel, author: FakeUser, command_name: str):
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.command = FakeCommand(command_name)
+        self.errors = 0
+
+    async def send(self, content=None, **kwargs):
+        if content and content.startswith("❌ An error occurred"):
+            self.errors += 1
+        await self.channel.send(content, **kwargs)
+
+def build_backend(limiter: RateLimiter, guilds: int, channels: int, messages: int, members: int, seed: int):
+    """Create guilds and channels full of movie posts with numeric reactions"""
+    rng = random.Random(seed)
+    users = [FakeUser(1000 + i) for i in range(members)]
+    bot_user = FakeUser(1, is_bot=True)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    all_channels = []
+    next_id = 10_000
+
+    for g in range(guilds):
+        guild = FakeGuild(100 + g)
+        for c in range(channels):
+            channel = FakeChannel(limiter, guild, next_id)
+            next_id += 1
+            for m in range(messages):
+                poster = rng.choice(users)
+                message = FakeMessage(next_id, channel, poster, f"Movie {rng.randrange(messages * 2)}",
+                                      start + timedelta(hours=m))
+                next_id += 1
+                voters = rng.sample(users, rng.randrange(min(members, 12) + 1))
+                by_emoji = {}
+                for voter in voters:
+                    by_emoji.setdefault(rng.choice(NUMERIC_EMOJIS), []).append(voter)
+                for emoji, emoji_users in by_emoji.items():
+                    message.reactions.append(FakeReaction(limiter, message, emoji, emoji_users + [bot_user]))
+                channel.messages.append(message)
+            channel.messages.reverse()
+            all_channels.append(channel)
+    return all_channels, users
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_load_test(args):
+    limiter = RateLimiter(args.rate, args.burst, args.latency / 1000)
+    channels, users = build_backend(limiter, args.guilds, args.channels, args.messages, args.members, args.seed)
+    rng = random.Random(args.seed + 1)
+
+    # The real command callbacks, with their default arguments
+    workload = [
+        ('create_playlist', lambda ctx: bot.create_movie_playlist.callback(ctx, None, args.messages)),
+        ('analyze_ratings', lambda ctx: bot.analyze_channel_ratings.callback(ctx, None, args.messages)),
+        ('movie_stats', lambda ctx: bot.movie_statistics.callback(ctx, None, args.messages)),
+        ('query', lambda ctx: bot.query_movies.callback(ctx, 'avg>=6', 'votes>=3', 'sort=votes')),
+    ]
+
+    watchdog = bot.LoopWatchdog(log_file=None)
+    watchdog.start(asyncio.get_running_loop())
+
+    latencies = {name: [] for name, _ in workload}
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def invoke(name, handler):
+        nonlocal errors
+        ctx = FakeContext(rng.choice(channels), rng.choice(users), name)
+        async with semaphore:
+            watchdog.track_command(ctx)
+            started = time.perf_counter()
+            try:
+                await handler(ctx)
+            except Exception:
+                errors += 1
+            finally:
+                latencies[name].append(time.perf_counter() - started)
+                watchdog.untrack_command()
+            errors += ctx.errors
+
+    tracemalloc.start()
+    memory_before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+
+    await asyncio.gather(*(invoke(*rng.choice(workload)) for _ in range(args.commands)))
+
+    elapsed = time.perf_counter() - started
+    memory_after, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    watchdog.stop()
+
+    print("🚦 Load Test Results")
+    print("=" * 50)
+    print(f"Guilds: {args.guilds}, channels: {len(channels)}, messages per channel: {args.messages}")
+    print(f"Commands: {args.commands}, concurrency: {args.concurrency}")
+    print(f"Elapsed: {elapsed:.2f}s, throughput: {args.commands / elapsed:.1f} commands/s")
+    print(f"Errors: {errors}")
+    print(f"API requests: {limiter.requests}, throttled: {limiter.throttled} "
+          f"({100 * limiter.throttled / max(limiter.requests, 1):.1f}%)")
+    print(f"Memory growth: {(memory_after - memory_before) / 1024:.0f} KiB, peak: {memory_peak / 1024:.0f} KiB")
+    print(f"Event loop max lag: {watchdog.max_lag * 1000:.0f} ms, stalls: {len(watchdog.stalls)}")
+    print("-" * 50)
+    print(f"{'command':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, values in latencies.items():
+        if values:
+            print(f"{name:<18}{len(values):>7}"
+                  f"{percentile(values, 0.50) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+                  f"{percentile(values, 0.99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+
+    return errors == 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the movie rating bot's commands offline")
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--channels', type=int, default=3, help="channels per guild")
+    parser.add_argument('--messages', type=int, default=50, help="movie posts per channel")
+    parser.add_argument('--members', type=int, default=30, help="members who vote")
+    parser.add_argument('--commands', type=int, default=300, help="total command invocations")
+    parser.add_argument('--concurrency', type=int, default=50, help="commands running at the same time")
+    parser.add_argument('--rate', type=float, default=1000.0, help="simulated requests per second per route")
+    parser.add_argument('--burst', type=int, default=50, help="simulated burst size per route")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated API latency in ms")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    ok = asyncio.run(run_load_test(args))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-ins for discord.py objects shared by the test scripts
+"""
+
+class MockBot:
+    pass
+
+class MockGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+class MockUser:
+    def __init__(self, user_id, is_bot=False):
+        self.id = user_id
+        self.bot = is_bot
+        self.display_name = f"user{user_id}"
+
+class MockReaction:
+    def __init__(self, emoji, users):
+        self.emoji = emoji
+        self._users = users
+
+    async def users(self):
+        for user in self._users:
+            yield user
+
+def check(failures, condition, description):
+    """Count a failed condition and print what went wrong"""
+    if not condition:
+        print(f"❌ {description}")
+        return failures + 1
+    return failures
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the minimum gap between repeats of the same movie
+"""
+
+import sys
+import os
+import time
+import itertools
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bot import MoviePlaylist, RatingBot
+from mock_discord import MockBot
+
+def smallest_gap(playlist):
+    """Smallest number of other movies between two plays of the same movie"""
+    last_seen = {}
+    gap = None
+    for i, movie in enumerate(playlist):
+        if movie in last_seen:
+            current = i - last_seen[movie] - 1
+            gap = current if gap is None else min(gap, current)
+        last_seen[movie] = i
+    return gap
+
+def first_round_complete(playlist, movies):
+    """Check that every movie plays once before any movie repeats"""
+    return set(playlist[:len(movies)]) == set(movies)
+
+def best_possible_gap(frequencies):
+    """Largest smallest-gap any round-based arrangement can reach (brute force, small inputs only)"""
+    rounds = [[movie for movie, freq in frequencies.items() if freq > r] for r in range(max(frequencies.values()))]
+    best = 0
+    for orders in itertools.product(*(itertools.permutations(r) for r in rounds)):
+        best = max(best, smallest_gap([movie for order in orders for movie in order]))
+    return best
+
+def test_min_gap():
+    """Test that repeats respect the minimum gap when it can be satisfied"""
+
+    # Create instances
+    mock_bot = MockBot()
+    rating_bot = RatingBot(mock_bot)
+    movie_playlist = MoviePlaylist(rating_bot)
+
+    movies = [
+        "Vertigo", "May", "Aliens", "Predator", "Ringu",
+        "Jeepers Creepers", "Us", "Halloween", "Friday the 13th",
+        "The Shining", "+1", "Them"
+    ]
+
+    # Top rated movies get default_frequency + 2, like the playlist rules
+    test_frequencies = {}
+    for i, movie in enumerate(movies):
+        if i < 4:
+            test_frequencies[movie] = 5
+        elif i < 8:
+            test_frequencies[movie] = 4
+        else:
+            test_frequencies[movie] = 3
+
+    print("🎬 Testing Minimum Gap")
+    print("=" * 50)
+    print(f"Frequencies: {test_frequencies}")
+
+    failures = 0
+    for min_gap in range(1, 4):
+        for test_num in range(20):
+            playlist = movie_playlist.create_smart_playlist(test_frequencies, min_gap)
+            gap = smallest_gap(playlist)
+            if gap < min_gap or not first_round_complete(playlist, movies):
+                failures += 1
+                print(f"❌ min_gap={min_gap} run #{test_num + 1}: smallest gap {gap}")
+                print(f"   {playlist}")
+        print(f"min_gap={min_gap}: checked 20 playlists")
+
+    # Satisfiable only if movies that carry into the next round are placed early: B C A B C A B C
+    for frequencies in ({"A": 2, "B": 3, "C": 3}, {"A": 1, "B": 2, "C": 2}):
+        for test_num in range(200):
+            playlist = movie_playlist.create_smart_playlist(frequencies, 2)
+            if smallest_gap(playlist) < 2:
+                failures += 1
+                print(f"❌ {frequencies} with min_gap=2: got {playlist}")
+                break
+        print(f"{frequencies} min_gap=2: checked 200 playlists")
+
+    # Unsatisfiable gaps: the gap should be the best the round structure allows
+    for frequencies in ({"A": 4, "B": 4, "C": 1}, {"A": 3, "B": 3, "C": 3, "D": 1}):
+        best = best_possible_gap(frequencies)
+        playlist = movie_playlist.create_smart_playlist(frequencies, 3)
+        print(f"Unsatisfiable gap: {playlist} (smallest gap {smallest_gap(playlist)}, best {best})")
+        if smallest_gap(playlist) < best:
+            failures += 1
+            print("❌ Gap is smaller than the best possible arrangement!")
+
+    # Every small case: the gap reaches min(min_gap, best possible)
+    checked = 0
+    for size in (2, 3, 4):
+        for counts in itertools.product(range(1, 4), repeat=size):
+            frequencies = dict(zip("ABCD", counts))
+            best = best_possible_gap(frequencies) if max(counts) > 1 else None
+            for min_gap in range(1, 4):
+                for test_num in range(5):
+                    checked += 1
+                    playlist = movie_playlist.create_smart_playlist(frequencies, min_gap)
+                    if best is not None and smallest_gap(playlist) < min(min_gap, best):
+                        failures += 1
+                        print(f"❌ {frequencies} with min_gap={min_gap}: got {playlist}, best gap is {best}")
+    print(f"Brute-force comparison: checked {checked} playlists")
+
+    # Large playlist: thousands of entries should be arranged quickly
+    large_frequencies = {f"Movie {i}": 3 + i % 3 for i in range(1000)}
+    start = time.time()
+    playlist = movie_playlist.create_smart_playlist(large_frequencies, 50)
+    elapsed = time.time() - start
+    print(f"\nLarge playlist: {len(playlist)} entries in {elapsed:.3f}s (smallest gap {smallest_gap(playlist)})")
+    if smallest_gap(playlist) < 50:
+        failures += 1
+        print("❌ Large playlist violates the minimum gap!")
+
+    if failures:
+        print(f"\n❌ {failures} failure(s)")
+    else:
+        print("\n✅ All minimum gap checks passed!")
+    assert failures == 0, f"{failures} minimum gap check(s) failed"
+
+if __name__ == "__main__":
+    try:
+        test_min_gap()
+    except AssertionError:
+        sys.exit(1)
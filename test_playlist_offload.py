@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script to verify large playlists are arranged in the process pool and time out cleanly
+"""
+
+import sys
+import os
+import asyncio
+import signal
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import bot
+from bot import MoviePlaylist, RatingBot, arrange_playlist, shutdown_playlist_executor, PLAYLIST_OFFLOAD_THRESHOLD
+from mock_discord import MockBot, check
+
+def has_consecutive_duplicates(playlist):
+    return any(playlist[i] == playlist[i + 1] for i in range(len(playlist) - 1))
+
+async def run_checks(movie_playlist):
+    failures = 0
+
+    # Large playlist goes through the process pool
+    large_frequencies = {f"Movie {i}": 3 for i in range(PLAYLIST_OFFLOAD_THRESHOLD)}
+    playlist = await movie_playlist.create_smart_playlist_async(large_frequencies)
+    print(f"Offloaded playlist: {len(playlist)} entries, pool created: {bot._playlist_executor is not None}")
+    if len(playlist) != 3 * PLAYLIST_OFFLOAD_THRESHOLD or has_consecutive_duplicates(playlist):
+        failures += 1
+        print("❌ Offloaded playlist is wrong")
+    if bot._playlist_executor is None:
+        failures += 1
+        print("❌ Large playlist did not use the process pool")
+
+    # A timeout shorter than the work raises TimeoutError in the command
+    try:
+        await movie_playlist.create_smart_playlist_async(large_frequencies, timeout=0.0001)
+        print("⚠️ Arrangement finished before the timeout (machine is very fast)")
+    except asyncio.TimeoutError:
+        print("Timeout raised as expected")
+
+    # The pool is still usable after a timeout
+    playlist = await movie_playlist.create_smart_playlist_async(large_frequencies)
+    failures = check(failures, len(playlist) == 3 * PLAYLIST_OFFLOAD_THRESHOLD,
+                     "Process pool unusable after a timeout")
+
+    # A dead worker breaks the pool; the job is retried on a fresh one
+    broken_pool = bot._playlist_executor
+    for process in list(broken_pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    playlist = await movie_playlist.create_smart_playlist_async(large_frequencies)
+    print(f"Playlist after a worker crash: {len(playlist)} entries")
+    failures = check(failures, len(playlist) == 3 * PLAYLIST_OFFLOAD_THRESHOLD,
+                     "Playlist should be arranged again after a worker crash")
+    failures = check(failures, bot._playlist_executor is not broken_pool, "Broken pool should be replaced")
+
+    shutdown_playlist_executor()
+    failures = check(failures, bot._playlist_executor is None, "Pool should be gone after shutdown")
+
+    return failures
+
+def test_playlist_offload():
+    """Test the offload path, the timeout and the worker-side deadline"""
+
+    # Create instances
+    mock_bot = MockBot()
+    rating_bot = RatingBot(mock_bot)
+    movie_playlist = MoviePlaylist(rating_bot)
+
+    print("🎬 Testing Playlist Offload")
+    print("=" * 50)
+
+    failures = asyncio.run(run_checks(movie_playlist))
+
+    # The worker gives up on its own once its deadline has passed
+    try:
+        arrange_playlist({"A": 3, "B": 3}, 1, time.time() - 1)
+        failures += 1
+        print("❌ Worker ignored a past deadline")
+    except TimeoutError:
+        print("Worker stopped at its deadline")
+
+    if failures:
+        print(f"\n❌ {failures} failure(s)")
+    else:
+        print("\n✅ All playlist offload checks passed!")
+    assert failures == 0, f"{failures} playlist offload check(s) failed"
+
+if __name__ == "__main__":
+    try:
+        test_playlist_offload()
+    except AssertionError:
+        sys.exit(1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the !query parser and the movie index
+"""
+
+import sys
+import os
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bot import MovieIndex, RatingRecord, parse_query_terms
+from mock_discord import check
+
+def make_record(message_id, ratings, guild_id=1, channel_id=10, author_id=100, day=1, title=None):
+    return RatingRecord(message_id, f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}",
+                        title or f"Movie {message_id}", ratings, channel_id, author_id,
+                        datetime(2024, 3, day, 12, 0, tzinfo=timezone.utc), guild_id)
+
+def ids(records):
+    return [record.message_id for record in records]
+
+def test_query():
+    """Test parsing of query terms, range edges, guild scoping and replacing records"""
+
+    print("🔎 Testing Movie Query")
+    print("=" * 50)
+
+    failures = 0
+
+    # Parser: inclusive and strict bounds
+    filters = parse_query_terms(["avg>=7", "votes<5"])
+    failures = check(failures, filters == {'min_average': 7.0, 'max_votes': 4}, f"avg>=7 votes<5 parsed as {filters}")
+    filters = parse_query_terms(["votes>3", "avg<=6.5"])
+    failures = check(failures, filters == {'min_votes': 4, 'max_average': 6.5}, f"votes>3 avg<=6.5 parsed as {filters}")
+    filters = parse_query_terms(["avg=8"])
+    failures = check(failures, filters == {'min_average': 8.0, 'max_average': 8.0}, f"avg=8 parsed as {filters}")
+
+    # Dates cover the whole day
+    day = datetime(2024, 3, 2, tzinfo=timezone.utc)
+    end_of_day = datetime(2024, 3, 2, 23, 59, 59, 999999, tzinfo=timezone.utc)
+    next_day = datetime(2024, 3, 3, tzinfo=timezone.utc)
+    filters = parse_query_terms(["posted=2024-03-02"])
+    failures = check(failures, filters == {'posted_after': day, 'posted_before': end_of_day}, f"posted= parsed as {filters}")
+    filters = parse_query_terms(["posted>2024-03-02"])
+    failures = check(failures, filters == {'posted_after': next_day}, f"posted> parsed as {filters}")
+    filters = parse_query_terms(["posted<2024-03-02"])
+    failures = check(failures, filters['posted_before'] < day, f"posted< parsed as {filters}")
+
+    filters = parse_query_terms(["poster=<@123>", "channel=<#456>", "sort=count", "order=asc", "limit=5"])
+    expected = {'poster_id': 123, 'channel_id': 456, 'sort': 'votes', 'descending': False, 'limit': 5}
+    failures = check(failures, filters == expected, f"mentions and options parsed as {filters}")
+
+    for bad in (["limit>5"], ["sort<votes"], ["order>=asc"], ["poster>12"], ["limit=0"], ["rating=5"], ["avg7"]):
+        try:
+            parse_query_terms(bad)
+            failures = check(failures, False, f"{bad} should be rejected")
+        except ValueError:
+            pass
+
+    # Index: range edges are inclusive
+    index = MovieIndex()
+    index.add(make_record(1, [7, 7, 7], day=1))           # avg 7.0, 3 votes
+    index.add(make_record(2, [8, 9], day=2))              # avg 8.5, 2 votes
+    index.add(make_record(3, [], day=2))                  # unrated
+    index.add(make_record(4, [4, 5, 6, 5, 5], day=3, author_id=101, channel_id=11))
+    index.add(make_record(5, [10], guild_id=2, channel_id=20))  # another guild
+
+    failures = check(failures, ids(index.query(1, min_average=7.0)) == [2, 1], "avg>=7 should include exactly 7.0")
+    failures = check(failures, ids(index.query(1, **parse_query_terms(["avg>7"]))) == [2], "avg>7 should exclude 7.0")
+    failures = check(failures, 3 not in ids(index.query(1, max_average=9)), "unrated movies should not match avg bounds")
+    failures = check(failures, sorted(ids(index.query(1, min_votes=3))) == [1, 4], "votes>=3 should include exactly 3")
+    failures = check(failures, sorted(ids(index.query(1, max_votes=0))) == [3], "votes<=0 should find unrated movies")
+    failures = check(failures, sorted(ids(index.query(1, **parse_query_terms(["posted=2024-03-02"])))) == [2, 3],
+                     "posted= should cover the whole day")
+    failures = check(failures, ids(index.query(1, **parse_query_terms(["posted>2024-03-02"]))) == [4],
+                     "posted> should start the next day")
+    failures = check(failures, ids(index.query(1, poster_id=101)) == [4], "poster filter")
+    failures = check(failures, ids(index.query(1, channel_id=11)) == [4], "channel filter")
+    # Fewer channel matches than movies in range: bounds are checked on the matches directly
+    failures = check(failures, ids(index.query(1, channel_id=11, min_average=4)) == [4], "channel with avg>=4")
+    failures = check(failures, ids(index.query(1, channel_id=11, max_average=4)) == [], "channel with avg<=4")
+    failures = check(failures, ids(index.query(1, sort='votes', descending=False, limit=2)) == [3, 2],
+                     "sort by votes ascending with limit")
+
+    # Guild scoping
+    failures = check(failures, 5 not in ids(index.query(1)), "guild 1 should not see guild 2 movies")
+    failures = check(failures, ids(index.query(2)) == [5], "guild 2 should only see its own movies")
+    failures = check(failures, ids(index.query(1, channel_id=20)) == [], "channels of another guild should match nothing")
+    failures = check(failures, index.guild_size(1) == 4 and index.guild_size(2) == 1, "guild sizes")
+
+    # Adding to one guild keeps the other guilds' sorted indexes
+    index.add(make_record(7, [6], guild_id=2, channel_id=20))
+    failures = check(failures, 1 in index._sorted and 2 not in index._sorted,
+                     "only the guild added to should lose its sorted indexes")
+    failures = check(failures, ids(index.query(2, min_average=5)) == [5, 7], "guild 2 should see its new movie")
+
+    # Replacing a record updates every index
+    index.add(make_record(1, [2, 2, 2], day=1, author_id=102, channel_id=12))
+    failures = check(failures, 1 not in ids(index.query(1, min_average=7.0)), "old average should be gone")
+    failures = check(failures, ids(index.query(1, max_average=3)) == [1], "new average should be indexed")
+    failures = check(failures, sorted(ids(index.query(1, poster_id=100))) == [2, 3],
+                     "old poster entry should be gone")
+    failures = check(failures, ids(index.query(1, channel_id=12)) == [1], "new channel should be indexed")
+    failures = check(failures, index.guild_size(1) == 4, "replacing should not add a movie")
+
+    # A merged repost replaces the separate record of the older post
+    merged = make_record(6, [9, 9, 9], day=4)
+    merged.reposts = (2,)
+    index.add(merged)
+    failures = check(failures, 2 not in index.records and 6 in index.records, "repost should replace the older record")
+
+    if failures:
+        print(f"\n❌ {failures} failure(s)")
+    else:
+        print("\n✅ All query checks passed!")
+    assert failures == 0, f"{failures} query check(s) failed"
+
+if __name__ == "__main__":
+    try:
+        test_query()
+    except AssertionError:
+        sys.exit(1)
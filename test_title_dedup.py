@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script to verify reposts of the same movie are merged during a scan
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bot import MoviePlaylist, RatingBot
+from mock_discord import MockBot, MockUser, MockReaction, check
+
+class MockChannel:
+    id = 1
+
+    def __init__(self, posts):
+        # posts: [(title, [(emoji, [user ids])])], oldest first
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.messages = []
+        for i, (title, reactions) in enumerate(posts):
+            message = type('MockMessage', (), {})()
+            message.id = 100 + i
+            message.channel = self
+            message.guild = None
+            message.author = MockUser(1)
+            message.content = title
+            message.created_at = start + timedelta(days=i)
+            message.jump_url = f"https://discord.com/channels/0/1/{message.id}"
+            message.reactions = [MockReaction(emoji, [MockUser(u) for u in users]) for emoji, users in reactions]
+            self.messages.append(message)
+
+    async def history(self, limit=100):
+        for message in reversed(self.messages[-limit:]):
+            yield message
+
+def test_title_dedup():
+    """Test that reposts with different spelling merge their votes"""
+
+    # Create instances
+    mock_bot = MockBot()
+    rating_bot = RatingBot(mock_bot)
+    movie_playlist = MoviePlaylist(rating_bot)
+
+    print("🎬 Testing Title Normalisation")
+    print("=" * 50)
+
+    failures = 0
+    same_movie = [("Aliens", "aliens (1986)"), ("ALIENS!", "Aliens [1986]"), ("Amélie", "amelie"),
+                  ("Spider-Man: No Way Home", "spider man no way home")]
+    different_movies = [("Blade Runner", "Blade Runner 2049"), ("Us", "Them")]
+
+    for first, second in same_movie:
+        if movie_playlist.normalize_title(first) != movie_playlist.normalize_title(second):
+            failures += 1
+            print(f"❌ '{first}' and '{second}' should match")
+    for first, second in different_movies:
+        if movie_playlist.normalize_title(first) == movie_playlist.normalize_title(second):
+            failures += 1
+            print(f"❌ '{first}' and '{second}' should not match")
+
+    channel = MockChannel([
+        ("Aliens", [('8️⃣', [2, 3]), ('9️⃣', [4])]),
+        ("Predator", [('7️⃣', [2])]),
+        ("aliens (1986)", [('🔟', [5])]),
+    ])
+    movie_data = asyncio.run(movie_playlist.analyze_movie_ratings(channel))
+
+    print(f"Movies after scan: {list(movie_data)}")
+    aliens = movie_data.get("aliens (1986)")
+    if len(movie_data) != 2 or aliens is None:
+        failures += 1
+        print("❌ Reposts were not merged into the most recent post")
+    elif aliens.ratings != [8, 8, 9, 10]:
+        failures += 1
+        print(f"❌ Merged ratings should be [8, 8, 9, 10], got {aliens.ratings}")
+    else:
+        print(f"Aliens: {aliens.count} ratings, average {aliens.average:.2f}, reposts {aliens.reposts}")
+
+    # Link, title, poster and date all come from the most recent post
+    if aliens is not None:
+        newest = channel.messages[2]
+        if (aliens.message_id, aliens.jump_url, aliens.created_at) != (newest.id, newest.jump_url, newest.created_at):
+            failures += 1
+            print("❌ Merged record should describe the most recent post")
+
+    if len(movie_playlist.movie_index.records) != 2:
+        failures += 1
+        print("❌ Movie index should hold one record per movie")
+
+    # A member who rated both posts counts once, resolved with the duplicate policy
+    for policy, expected in (('latest', [8, 9]), ('highest', [8, 9]), ('average', [7, 9])):
+        rating_bot.duplicate_policies[None] = policy
+        channel = MockChannel([
+            ("Aliens", [('8️⃣', [2]), ('5️⃣', [3])]),
+            ("aliens (1986)", [('9️⃣', [2]), ('8️⃣', [3])]),
+        ])
+        movie_data = asyncio.run(movie_playlist.analyze_movie_ratings(channel))
+        ratings = movie_data["aliens (1986)"].ratings
+        print(f"Member rated both posts, {policy} policy: {ratings}")
+        if ratings != expected:
+            failures += 1
+            print(f"❌ Expected {expected} with the {policy} policy, got {ratings}")
+
+    # The policy is applied once to all of a member's ratings, not per post and then again
+    for policy, expected in (('latest', [9]), ('highest', [9]), ('average', [8])):
+        rating_bot.duplicate_policies[None] = policy
+        channel = MockChannel([
+            ("Aliens", [('7️⃣', [2]), ('8️⃣', [2])]),
+            ("aliens (1986)", [('9️⃣', [2])]),
+        ])
+        ratings = asyncio.run(movie_playlist.analyze_movie_ratings(channel))["aliens (1986)"].ratings
+        print(f"7 and 8 on one post, 9 on the other, {policy} policy: {ratings}")
+        failures = check(failures, ratings == expected, f"Expected {expected} with the {policy} policy, got {ratings}")
+
+    if failures:
+        print(f"\n❌ {failures} failure(s)")
+    else:
+        print("\n✅ All title normalisation checks passed!")
+    assert failures == 0, f"{failures} title normalisation check(s) failed"
+
+if __name__ == "__main__":
+    try:
+        test_title_dedup()
+    except AssertionError:
+        sys.exit(1)
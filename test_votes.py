@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script to verify one vote per member, duplicate policies and the vote index
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bot import RatingBot, resolve_duplicate_votes
+from mock_discord import MockBot, MockGuild, MockUser, MockReaction, check
+
+class MockChannel:
+    def __init__(self, channel_id, guild):
+        self.id = channel_id
+        self.guild = guild
+
+class MockMessage:
+    def __init__(self, message_id, channel, reactions):
+        # reactions: [(emoji, [user ids])]
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = f"Movie {message_id}"
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{message_id}"
+        self.reactions = [MockReaction(emoji, [MockUser(u) for u in users]) for emoji, users in reactions]
+
+def test_votes():
+    """Test duplicate vote resolution, per-guild policies, re-scans, missing voters and guild scoping"""
+
+    print("🗳️ Testing Vote Index")
+    print("=" * 50)
+
+    failures = 0
+
+    # Duplicate policies on one member's ratings, in reaction order
+    failures = check(failures, resolve_duplicate_votes([9, 7], 'latest') == 7, "latest should pick the last rating")
+    failures = check(failures, resolve_duplicate_votes([7, 9, 8], 'highest') == 9, "highest should pick 9")
+    failures = check(failures, resolve_duplicate_votes([7, 8], 'average') == 8, "average of 7 and 8 should round up to 8")
+    failures = check(failures, resolve_duplicate_votes([6, 7, 7], 'average') == 7, "average 6.67 should round to 7")
+    failures = check(failures, resolve_duplicate_votes([0, 1, 1, 1], 'average') == 1, "average 0.75 should round to 1")
+
+    rating_bot = RatingBot(MockBot())
+    index = rating_bot.vote_index
+    guild = MockGuild(1)
+    channel = MockChannel(10, guild)
+
+    # Member 2 reacts with 7 and 9 on the same message; the bot's own reaction is ignored
+    first = MockMessage(100, channel, [('7️⃣', [2, 3]), ('9️⃣', [2])])
+    first.reactions[0]._users.append(MockUser(99, is_bot=True))
+    ratings = asyncio.run(rating_bot.extract_numeric_reactions(first))
+    print(f"Ratings with latest policy: {sorted(ratings)}")
+    failures = check(failures, sorted(ratings) == [7, 9], "each member should count once")
+    failures = check(failures, index.message_votes(100) == {2: 9, 3: 7}, "message votes should be resolved per member")
+
+    rating_bot.duplicate_policies[1] = 'average'
+    second = MockMessage(101, channel, [('6️⃣', [2, 4]), ('9️⃣', [2])])
+    ratings = asyncio.run(rating_bot.extract_numeric_reactions(second))
+    failures = check(failures, sorted(ratings) == [6, 8], "average of 6 and 9 should round to 8")
+
+    # Who hasn't voted: voters elsewhere in the channel but not on this message
+    failures = check(failures, index.missing_voters(100) == {4}, "member 4 should be missing on message 100")
+    failures = check(failures, index.missing_voters(101) == {3}, "member 3 should be missing on message 101")
+    failures = check(failures, index.user_votes(2, 1) == {100: 9, 101: 8}, "member 2 should have two votes")
+
+    # A re-scan replaces the earlier votes for that message
+    rescan = MockMessage(100, channel, [('5️⃣', [4])])
+    asyncio.run(rating_bot.extract_numeric_reactions(rescan))
+    failures = check(failures, index.message_votes(100) == {4: 5}, "re-scan should replace old votes")
+    failures = check(failures, 100 not in index.user_votes(2, 1), "re-scan should drop member 2's old vote")
+    failures = check(failures, index.missing_voters(100) == {2}, "member 2 should now be missing on message 100")
+
+    # Votes in another guild stay in that guild, which keeps the default policy
+    other_channel = MockChannel(20, MockGuild(2))
+    asyncio.run(rating_bot.extract_numeric_reactions(MockMessage(200, other_channel, [('3️⃣', [2]), ('5️⃣', [2])])))
+    failures = check(failures, rating_bot.duplicate_policy(2) == 'latest', "guild 2 should keep the default policy")
+    failures = check(failures, index.user_votes(2, 1) == {101: 8}, "guild 1 should not see guild 2 votes")
+    failures = check(failures, index.user_votes(2, 2) == {200: 5}, "guild 2 should only see its own votes, latest policy")
+    failures = check(failures, index.message_guild(200) == 2, "message 200 should belong to guild 2")
+    failures = check(failures, index.missing_voters(200) == set(), "other guilds' voters should not be missing")
+
+    if failures:
+        print(f"\n❌ {failures} failure(s)")
+    else:
+        print("\n✅ All vote index checks passed!")
+    assert failures == 0, f"{failures} vote index check(s) failed"
+
+if __name__ == "__main__":
+    try:
+        test_votes()
+    except AssertionError:
+        sys.exit(1)